@@ -0,0 +1,133 @@
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+''' Generate debug projects for many executables from one valinor process.
+
+The manifest is a JSON list of entries like:
+
+    [
+        {"executable": "build/a/test.elf", "target": "K64F", "tool": "uvision"},
+        {"executable": "build/b/test.elf", "target": "K64F", "project_dir": "proj/b"}
+    ]
+
+"tool" and "project_dir" are optional, and have the same meaning as the
+--tool and --project-dir options. Relative paths are relative to the current
+directory. Entries are generated in parallel by a pool of worker processes,
+each of which pays the startup costs (imports, IDE scan) only once.
+'''
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+
+import valinor.logging_setup as logging_setup
+
+logger = logging.getLogger('batch')
+
+def _init_worker(log_level):
+    logging_setup.init()
+    logging.getLogger().setLevel(log_level)
+    # do the imports in each worker up front, rather than in its first job:
+    import valinor.main
+    import project_generator.project
+
+def _generate_entry(entry):
+    ''' generate one manifest entry, return a report dictionary '''
+    from valinor.main import generate_project, GenerationError
+    start = time.time()
+    report = {
+        'executable': entry.get('executable'),
+            'target': entry.get('target'),
+              'tool': entry.get('tool'),
+    }
+    try:
+        if not report['executable'] or not report['target']:
+            raise GenerationError('manifest entries need an "executable" and a "target"')
+        generated = generate_project(entry['executable'], entry['target'],
+            entry.get('tool'), entry.get('project_dir'),
+            use_cache=entry.get('use_cache', True), force=entry.get('force', False)
+        )
+        report.update({
+            'status': 'ok',
+              'tool': generated['tool'],
+              'path': os.path.normpath(generated['projectfiles']['path']),
+             'files': generated['projectfiles']['files'],
+        })
+    except Exception as e:
+        report.update({'status': 'failed', 'error': str(e) or e.__class__.__name__})
+    report['seconds'] = round(time.time() - start, 3)
+    return report
+
+def read_manifest(path):
+    ''' read a manifest from path ('-' for stdin), returning a list of entry
+        dictionaries '''
+    if path == '-':
+        manifest = json.load(sys.stdin)
+    else:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    if not isinstance(manifest, list) or not all(isinstance(x, dict) for x in manifest):
+        raise ValueError('manifest must be a list of objects')
+    return manifest
+
+def run(entries, jobs=None):
+    ''' generate all entries, using up to jobs worker processes, return a
+        list of report dictionaries in the same order as entries '''
+    if not entries:
+        return []
+    jobs = max(1, min(jobs or multiprocessing.cpu_count(), len(entries)))
+    level = logging.getLogger().getEffectiveLevel()
+    if jobs == 1:
+        _init_worker(level)
+        return [_generate_entry(e) for e in entries]
+    pool = multiprocessing.Pool(jobs, _init_worker, (level,))
+    try:
+        return pool.map(_generate_entry, entries, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def command(argv):
+    ''' valinor batch MANIFEST: generate the debug projects described by a
+        manifest, print a report of which succeeded '''
+    p = argparse.ArgumentParser(prog='valinor batch',
+        description='Generate debug projects for all the executables listed '+
+                    'in a JSON manifest.'
+    )
+    p.add_argument('manifest',
+        help='Path to the manifest file, or - to read it from stdin.'
+    )
+    p.add_argument('-j', '--jobs', dest='jobs', type=int, default=None,
+        help='Number of worker processes (defaults to the number of CPUs).'
+    )
+    p.add_argument('--report', dest='report', default=None,
+        help='Also write the report, as JSON, to this file.'
+    )
+    args = p.parse_args(argv)
+
+    try:
+        entries = read_manifest(args.manifest)
+    except (IOError, OSError, ValueError) as e:
+        logger.error('failed to read manifest %s: %s', args.manifest, e)
+        return 1
+
+    reports = run(entries, args.jobs)
+
+    for r in reports:
+        if r['status'] == 'ok':
+            print('ok      %s (%s): %s' % (r['executable'], r['tool'], r['path']))
+        else:
+            print('failed  %s: %s' % (r['executable'], r['error']))
+    failed = len([r for r in reports if r['status'] != 'ok'])
+    print('%d generated, %d failed' % (len(reports) - failed, failed))
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(reports, f, indent=2, sort_keys=True)
+    return 1 if failed else 0
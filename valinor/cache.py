@@ -0,0 +1,255 @@
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+''' Persistent on-disk cache for data that is expensive to derive (for
+example the list of source files read from the DWARF information in an
+executable). Entries are small JSON documents stored one per file, and the
+cache is kept below a maximum size by evicting the least recently used
+entries. '''
+
+import os
+import json
+import errno
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger('cache')
+
+# the cache lives here unless VALINOR_CACHE_DIR is set:
+Default_Cache_Dir = os.path.join(os.path.expanduser('~'), '.valinor', 'cache')
+
+# maximum total size (in bytes) of all entries in a cache namespace, can be
+# overridden with VALINOR_CACHE_SIZE:
+Default_Max_Size = 32 * 1024 * 1024
+
+# files written with atomic_write get the default permissions, rather than
+# the private ones that temporary files are created with:
+_Umask = os.umask(0)
+os.umask(_Umask)
+
+# read executables in chunks of this size when hashing their contents:
+_Hash_Chunk_Size = 1024 * 1024
+
+def cache_dir():
+    ''' return the root directory of the valinor cache '''
+    return os.environ.get('VALINOR_CACHE_DIR') or Default_Cache_Dir
+
+def state_dir():
+    ''' return the directory for valinor's runtime state (such as the details
+        of a running gdbserver daemon) '''
+    return os.environ.get('VALINOR_STATE_DIR') or os.path.join(os.path.expanduser('~'), '.valinor')
+
+def cache_disabled():
+    ''' return True if caching has been disabled by the environment '''
+    return bool(os.environ.get('VALINOR_NO_CACHE'))
+
+def atomic_write(path, data, mode=None):
+    ''' write data (bytes) to path so that readers see either the old or the
+        new contents, never a partially written file. The file gets the
+        default permissions, unless mode is given. '''
+    dirname = os.path.dirname(path) or '.'
+    mkdir_p(dirname)
+    # the temporary file is created readable only by its owner, so a
+    # restrictive mode applies from the start:
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, (0o666 & ~_Umask) if mode is None else mode)
+        _replace(tmp_path, path)
+    except:
+        _remove_if_exists(tmp_path)
+        raise
+
+def _replace(src, dst):
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:
+        # python 2: rename doesn't overwrite on windows
+        if os.name == 'nt':
+            _remove_if_exists(dst)
+        os.rename(src, dst)
+
+def mkdir_p(path, mode=0o777):
+    ''' create path and any missing parent directories '''
+    try:
+        os.makedirs(path, mode)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+class DiskCache(object):
+    ''' A namespace of JSON-serialisable values in the on-disk cache, bounded
+        in total size with least-recently-used eviction. '''
+
+    def __init__(self, namespace, root=None, max_size=None):
+        self.namespace = namespace
+        self.path = os.path.join(root or cache_dir(), namespace)
+        if max_size is None:
+            max_size = int(os.environ.get('VALINOR_CACHE_SIZE', Default_Max_Size))
+        self.max_size = max_size
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key, default=None):
+        ''' return the value stored for key, or default '''
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                record = json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return default
+        if record.get('key') != key:
+            return default
+        # mark the entry as recently used:
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        logger.debug('%s: hit for %s', self.namespace, key)
+        return record.get('value')
+
+    def set(self, key, value):
+        ''' store value for key, evicting old entries if necessary. Failure to
+            write to the cache is logged, but is not an error. '''
+        data = json.dumps({'key': key, 'value': value}).encode('utf-8')
+        if len(data) > self.max_size:
+            logger.debug('%s: not caching %s, too large (%d bytes)', self.namespace, key, len(data))
+            return
+        try:
+            atomic_write(self._entry_path(key), data)
+            self._evict()
+        except (IOError, OSError) as e:
+            logger.warning('failed to write cache entry in %s: %s', self.path, e)
+
+    def entries(self):
+        ''' return a list of (path, size, last used time) for every entry,
+            most recently used first '''
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        r = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            r.append((path, st.st_size, st.st_mtime))
+        return sorted(r, key=lambda x: x[2], reverse=True)
+
+    def size(self):
+        ''' return the total size in bytes of all entries '''
+        return sum(x[1] for x in self.entries())
+
+    def clear(self):
+        ''' remove all entries, returning the number removed '''
+        removed = 0
+        for path, size, mtime in self.entries():
+            try:
+                _remove_if_exists(path)
+                removed += 1
+            except OSError as e:
+                logger.warning('failed to remove %s: %s', path, e)
+        return removed
+
+    def _evict(self):
+        total = 0
+        for path, size, mtime in self.entries():
+            total += size
+            if total > self.max_size:
+                logger.debug('%s: evicting %s', self.namespace, path)
+                _remove_if_exists(path)
+
+
+def _gnu_build_id(f):
+    ''' return the hex GNU build-id of the open ELF file f, or None '''
+    from elftools.elf.elffile import ELFFile
+    try:
+        elffile = ELFFile(f)
+        section = elffile.get_section_by_name('.note.gnu.build-id')
+        if section is None:
+            return None
+        for note in section.iter_notes():
+            if note['n_type'] == 'NT_GNU_BUILD_ID':
+                return note['n_desc']
+    except Exception as e:
+        logger.debug('failed to read build-id: %s', e)
+    return None
+
+def executable_key(filename):
+    ''' return a key that identifies the contents of an executable: its GNU
+        build-id if it has one, otherwise a hash of its size, modification
+        time and contents '''
+    with open(filename, 'rb') as f:
+        build_id = _gnu_build_id(f)
+        if build_id:
+            return 'build-id:' + build_id
+        st = os.fstat(f.fileno())
+        h = hashlib.sha1()
+        h.update(('%d:%r:' % (st.st_size, st.st_mtime)).encode('utf-8'))
+        f.seek(0)
+        while True:
+            chunk = f.read(_Hash_Chunk_Size)
+            if not chunk:
+                break
+            h.update(chunk)
+        return 'content:' + h.hexdigest()
+
+def distribution_version(name):
+    ''' return the installed version of the named python distribution, or
+        None if it isn't installed, for use in cache keys '''
+    try:
+        from importlib import metadata
+    except ImportError:
+        metadata = None
+    try:
+        if metadata is not None:
+            return metadata.version(name)
+        import pkg_resources
+        return pkg_resources.get_distribution(name).version
+    except Exception:
+        return None
+
+def namespaces():
+    ''' return the names of all cache namespaces that exist on disk '''
+    try:
+        return sorted(
+            x for x in os.listdir(cache_dir()) if os.path.isdir(os.path.join(cache_dir(), x))
+        )
+    except OSError:
+        return []
+
+def command(argv):
+    ''' valinor cache {info,clear}: inspect or clear the on-disk cache '''
+    import argparse
+    p = argparse.ArgumentParser(prog='valinor cache',
+        description='Inspect or clear the valinor cache in %s' % cache_dir()
+    )
+    p.add_argument('action', choices=('info', 'clear'))
+    args = p.parse_args(argv)
+
+    if args.action == 'info':
+        print('cache directory: %s' % cache_dir())
+        for ns in namespaces():
+            c = DiskCache(ns)
+            print('  %s: %d entries, %d bytes (limit %d)' % (ns, len(c.entries()), c.size(), c.max_size))
+    else:
+        removed = sum(DiskCache(ns).clear() for ns in namespaces())
+        print('removed %d cache entries from %s' % (removed, cache_dir()))
+    return 0
@@ -0,0 +1,292 @@
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+''' A long-running PyOCD gdbserver, which keeps the connection to the board
+open between debug sessions.
+
+Finding the board and connecting to it can take longer than the debug
+session itself, so "valinor gdbserver start" starts a background process
+which does this once, and serves any number of gdb sessions. While it is
+running, valinor's arm_none_eabi_gdb launcher connects gdb to it instead of
+starting its own server.
+
+The daemon is controlled through a socket on the loopback interface. Its
+port, and a random token that must accompany every request, are written to
+gdbserver.json in the valinor state directory (readable only by the user who
+started it). Requests and responses are single lines of JSON.
+'''
+
+import os
+import sys
+import json
+import time
+import errno
+import socket
+import logging
+import binascii
+import argparse
+import threading
+import subprocess
+
+from valinor import cache
+from valinor import gdb
+
+logger = logging.getLogger('daemon')
+
+# maximum time to wait for a daemon started in the background to be ready:
+Start_Timeout = 60.0
+
+def state_path():
+    ''' return the path of the file describing the running daemon '''
+    return os.path.join(cache.state_dir(), 'gdbserver.json')
+
+def _read_state():
+    try:
+        with open(state_path(), 'r') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+def _write_state(state):
+    # the state includes the token that authorises control requests, so
+    # neither it nor its directory are readable by other users:
+    cache.mkdir_p(cache.state_dir(), 0o700)
+    cache.atomic_write(state_path(), json.dumps(state).encode('utf-8'), mode=0o600)
+
+def _remove_state(pid):
+    state = _read_state()
+    if state is not None and state.get('pid') == pid:
+        try:
+            os.remove(state_path())
+        except OSError:
+            pass
+
+def _read_line(sock):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data.decode('utf-8')
+
+def request(command, timeout=5.0, **kwargs):
+    ''' send command to the running daemon, return its response (a
+        dictionary), or None if no daemon is running '''
+    state = _read_state()
+    if state is None:
+        return None
+    try:
+        sock = socket.create_connection(('127.0.0.1', state['control_port']), timeout=timeout)
+    except (socket.error, socket.timeout, KeyError):
+        logger.debug('gdbserver daemon is not running')
+        return None
+    try:
+        message = dict(kwargs, command=command, token=state.get('token'))
+        sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+        response = _read_line(sock)
+    except (socket.error, socket.timeout) as e:
+        logger.warning('failed to communicate with gdbserver daemon: %s', e)
+        return None
+    finally:
+        sock.close()
+    try:
+        return json.loads(response)
+    except ValueError:
+        return None
+
+def running_server():
+    ''' return the gdb port of the running daemon, if there is one and its
+        gdbserver is alive, otherwise None '''
+    status = request('status')
+    if status and status.get('alive'):
+        return status.get('gdb_port')
+    return None
+
+
+class _Daemon(object):
+    def __init__(self, gdb_port):
+        self.gdb_port = gdb_port
+        self.events = gdb._ServerEvents()
+        self.server_thread = None
+        self.started = time.time()
+        self.stopping = False
+
+    def cmd_status(self, message):
+        return {
+                 'pid': os.getpid(),
+            'gdb_port': self.gdb_port,
+               'alive': self.server_thread.is_alive() and self.events.alive,
+              'uptime': round(time.time() - self.started, 1),
+        }
+
+    def cmd_stop(self, message):
+        self.stopping = True
+        return {'stopping': True}
+
+    def _handle(self, conn):
+        try:
+            conn.settimeout(5.0)
+            try:
+                message = json.loads(_read_line(conn))
+            except ValueError:
+                message = {}
+            if message.get('token') != self.token:
+                response = {'error': 'not authorised'}
+            else:
+                handler = getattr(self, 'cmd_' + str(message.get('command')), None)
+                if handler is None:
+                    response = {'error': 'unknown command %s' % message.get('command')}
+                else:
+                    response = handler(message)
+            conn.sendall((json.dumps(response) + '\n').encode('utf-8'))
+        except (socket.error, socket.timeout) as e:
+            logger.warning('error handling control request: %s', e)
+        finally:
+            conn.close()
+
+    def serve(self):
+        self.server_thread = threading.Thread(
+            target=gdb._launchPyOCDGDBServer, args=(self.events, self.gdb_port)
+        )
+        self.server_thread.start()
+        try:
+            gdb._waitForServer(self.server_thread, self.events, self.gdb_port)
+        except Exception as e:
+            logger.error('%s', e)
+            self.events.stop.set()
+            self.server_thread.join()
+            return 1
+
+        control = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        control.bind(('127.0.0.1', 0))
+        control.listen(5)
+        # check periodically that the gdbserver is still running:
+        control.settimeout(1.0)
+        self.token = binascii.hexlify(os.urandom(16)).decode('ascii')
+        _write_state({
+                     'pid': os.getpid(),
+            'control_port': control.getsockname()[1],
+                   'token': self.token,
+                'gdb_port': self.gdb_port,
+        })
+        logger.info('gdbserver daemon listening on port %d', self.gdb_port)
+        try:
+            while not self.stopping and self.server_thread.is_alive():
+                try:
+                    conn, addr = control.accept()
+                except socket.timeout:
+                    continue
+                except socket.error as e:
+                    if e.args and e.args[0] == errno.EINTR:
+                        continue
+                    raise
+                self._handle(conn)
+        finally:
+            control.close()
+            _remove_state(os.getpid())
+            self.events.stop.set()
+            self.server_thread.join()
+        logger.info('gdbserver daemon stopped')
+        return 0
+
+def serve(gdb_port=None):
+    ''' run the daemon in this process until it is asked to stop '''
+    return _Daemon(gdb_port or gdb.Default_Port).serve()
+
+def start_background(gdb_port=None):
+    ''' start the daemon in a new background process, and wait for it to be
+        ready, return True if it started successfully '''
+    if request('status') is not None:
+        logger.info('gdbserver daemon is already running')
+        return True
+    cache.mkdir_p(cache.state_dir(), 0o700)
+    log_path = os.path.join(cache.state_dir(), 'gdbserver.log')
+    env = dict(os.environ)
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [package_parent] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else [])
+    )
+    kwargs = {}
+    if os.name == 'nt':
+        # DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP
+        kwargs['creationflags'] = 0x00000008 | 0x00000200
+    else:
+        kwargs['preexec_fn'] = os.setsid
+    with open(log_path, 'ab') as log, open(os.devnull, 'rb') as devnull:
+        child = subprocess.Popen(
+            [sys.executable, '-m', 'valinor.daemon', '--port', str(gdb_port or gdb.Default_Port)],
+            stdin = devnull,
+            stdout = log,
+            stderr = log,
+            env = env,
+            **kwargs
+        )
+    deadline = time.time() + Start_Timeout
+    while time.time() < deadline:
+        if child.poll() is not None:
+            logger.error('gdbserver daemon failed to start, see %s', log_path)
+            return False
+        status = request('status', timeout=1.0)
+        if status is not None and status.get('pid') == child.pid:
+            return True
+        time.sleep(0.05)
+    logger.error('timed out waiting for gdbserver daemon to start, see %s', log_path)
+    return False
+
+def command(argv):
+    ''' valinor gdbserver {start,status,stop}: control the gdbserver daemon '''
+    p = argparse.ArgumentParser(prog='valinor gdbserver',
+        description='Control a long-running PyOCD gdbserver, which keeps the '+
+                    'board connection open between debug sessions.'
+    )
+    p.add_argument('action', choices=('start', 'status', 'stop'))
+    p.add_argument('-p', '--port', dest='port', type=int, default=gdb.Default_Port,
+        help='Port for the gdbserver to listen on (default %d).' % gdb.Default_Port
+    )
+    p.add_argument('--foreground', dest='foreground', default=False, action='store_true',
+        help='Run the daemon in this process, instead of in the background.'
+    )
+    args = p.parse_args(argv)
+
+    if args.action == 'start':
+        if args.foreground:
+            return serve(args.port)
+        if not start_background(args.port):
+            return 1
+        status = request('status')
+        if status is None or not status.get('alive'):
+            logger.error('gdbserver daemon is running, but its gdbserver is not, '+
+                         'see %s', os.path.join(cache.state_dir(), 'gdbserver.log'))
+            return 1
+        if status['gdb_port'] != args.port:
+            logger.error('gdbserver daemon is already running on port %d, stop it '+
+                         'to start one on port %d', status['gdb_port'], args.port)
+            return 1
+        print('gdbserver daemon running on port %d' % status['gdb_port'])
+        return 0
+    elif args.action == 'status':
+        status = request('status')
+        if status is None:
+            print('gdbserver daemon is not running')
+            return 1
+        print('gdbserver daemon (pid %d) on port %d: %s, up %ds' % (
+            status['pid'], status['gdb_port'], ('not alive', 'alive')[bool(status['alive'])], status['uptime']
+        ))
+        return 0
+    else:
+        if request('stop') is None:
+            print('gdbserver daemon is not running')
+            return 1
+        print('gdbserver daemon stopping')
+        return 0
+
+if __name__ == '__main__':
+    import valinor.logging_setup as logging_setup
+    logging_setup.init()
+    logging.getLogger().setLevel(logging.INFO)
+    p = argparse.ArgumentParser()
+    p.add_argument('--port', type=int, default=gdb.Default_Port)
+    sys.exit(serve(p.parse_args().port))
@@ -11,28 +11,431 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+import mmap
+import struct
 import logging
+import collections
 
 from elftools.elf.elffile import ELFFile
 from elftools.common.exceptions import ELFError
 
-def get_files_from_executable(filename):
+from valinor import cache
+
+# bump this if the way sources are extracted changes, so that stale cache
+# entries are not used:
+_Sources_Cache_Version = 1
+
+def get_files_from_executable(filename, use_cache=True):
+    ''' return a list of the source file paths of all the compilation units
+        in the DWARF debug information of an executable. The result is cached
+        on disk, keyed by the executable's build-id (or contents), so that
+        repeated calls for the same executable don't re-parse the DWARF. '''
+    if not use_cache or cache.cache_disabled():
+        return list(iter_files_from_executable(filename))
+
+    sources_cache = cache.DiskCache('sources')
+    key = 'v%d:%s' % (_Sources_Cache_Version, cache.executable_key(filename))
+    files = sources_cache.get(key)
+    if files is not None:
+        logging.debug('using cached source list for %s', filename)
+        return files
+    files = list(iter_files_from_executable(filename))
+    # don't cache failures, the file might be being rewritten
+    if files:
+        sources_cache.set(key, files)
+    return files
+
+def iter_files_from_executable(filename):
+    ''' generate the source file paths of the compilation units in the DWARF
+        debug information of an executable, one at a time. The executable is
+        kept open while the generator is running, and memory use doesn't grow
+        with the size of the executable. '''
+    yielded = 0
+    try:
+        for path in _iter_files_fast(filename):
+            yielded += 1
+            yield path
+        return
+    except _NotELF:
+        logging.info("%s is invalid elf file" % filename)
+        return
+    except _Unsupported as e:
+        logging.debug('using pyelftools to read %s: %s', filename, e)
+    # units are read in the same order by both readers, so skip any that the
+    # fast reader already produced
+    for i, path in enumerate(_iter_files_pyelftools(filename)):
+        if i >= yielded:
+            yield path
+
+def _iter_files_pyelftools(filename):
     with open(filename, 'rb') as f:
         # ELFFile looks for magic number, if there's none, ELFError is raised
         try:
             elffile = ELFFile(f)
         except ELFError:
             logging.info("%s is invalid elf file" % filename)
-            return []
+            return
 
         if not elffile.has_dwarf_info():
             logging.info("File does not have dwarf info, no sources in the project file")
             return
         dwarfinfo = elffile.get_dwarf_info()
 
-    files = []
-    # Go over all the line programs in the DWARF information and get source files paths
-    for CU in dwarfinfo.iter_CUs():
-        top_DIE = CU.get_top_DIE()
-        files.append(top_DIE.get_full_path())
-    return files
+        # Go over all the compilation units in the DWARF information and get
+        # source files paths. pyelftools reads lazily from the file, so this
+        # must happen while it's still open.
+        for CU in dwarfinfo.iter_CUs():
+            top_DIE = CU.get_top_DIE()
+            yield top_DIE.get_full_path()
+
+
+# Fast path: the source file of each compilation unit is the DW_AT_name (and
+# DW_AT_comp_dir) of its top DIE, so we only need to read the unit headers and
+# the first DIE of each unit, and can skip over everything else in
+# .debug_info. The file is mmapped, so the parts we don't look at are never
+# read from disk.
+
+class _NotELF(Exception):
+    pass
+
+class _Unsupported(Exception):
+    pass
+
+SHT_NOBITS = 8
+SHF_COMPRESSED = 0x800
+
+DW_AT_name = 0x03
+DW_AT_comp_dir = 0x1b
+DW_AT_str_offsets_base = 0x72
+
+DW_FORM_string = 0x08
+DW_FORM_strp = 0x0e
+DW_FORM_indirect = 0x16
+DW_FORM_strx = 0x1a
+DW_FORM_line_strp = 0x1f
+DW_FORM_implicit_const = 0x21
+DW_FORM_strx1 = 0x25
+DW_FORM_strx4 = 0x28
+DW_FORM_GNU_str_index = 0x1f02
+
+Section = collections.namedtuple('Section', 'name type flags addr offset size')
+
+def elf_sections(buf):
+    """ return an ordered dictionary of section name to Section for the ELF
+        image in buf (any object supporting the buffer protocol and slicing,
+        such as an mmap), and the struct byte order prefix of the image """
+    if len(buf) < 52 or buf[:4] != b'\x7fELF':
+        raise _NotELF()
+    elfclass, data = struct.unpack_from('BB', buf, 4)
+    if data not in (1, 2) or elfclass not in (1, 2):
+        raise _NotELF()
+    e = '<' if data == 1 else '>'
+    if elfclass == 2:
+        e_type, = struct.unpack_from(e + 'H', buf, 16)
+        shoff, = struct.unpack_from(e + 'Q', buf, 40)
+        shentsize, shnum, shstrndx = struct.unpack_from(e + 'HHH', buf, 58)
+        sh_fmt = e + 'IIQQQQ'
+    else:
+        e_type, = struct.unpack_from(e + 'H', buf, 16)
+        shoff, = struct.unpack_from(e + 'I', buf, 32)
+        shentsize, shnum, shstrndx = struct.unpack_from(e + 'HHH', buf, 46)
+        sh_fmt = e + 'IIIIII'
+    if e_type == 1:
+        # relocatable objects need relocations applying to their DWARF
+        raise _Unsupported('relocatable object')
+    if shnum == 0 or shstrndx >= shnum:
+        raise _Unsupported('extended section numbering')
+    if shoff + shnum * shentsize > len(buf):
+        raise _NotELF()
+
+    headers = [
+        struct.unpack_from(sh_fmt, buf, shoff + i * shentsize) for i in range(shnum)
+    ]
+    strtab_offset = headers[shstrndx][4]
+    sections = collections.OrderedDict()
+    for name, sh_type, flags, addr, offset, size in headers[1:]:
+        name_start = strtab_offset + name
+        name_end = buf.find(b'\0', name_start)
+        name = buf[name_start:name_end].decode('ascii', 'replace')
+        sections[name] = Section(name, sh_type, flags, addr, offset, size)
+    return sections, e
+
+class _SectionView(object):
+    """ read access to the contents of a section of an mmapped file, with
+        offsets relative to the start of the section """
+
+    def __init__(self, buf, offset, size):
+        self.buf = buf
+        self.base = offset
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def unpack(self, fmt, offset):
+        if offset < 0 or offset + struct.calcsize(fmt) > self.size:
+            raise IndexError('read past end of section')
+        return struct.unpack_from(fmt, self.buf, self.base + offset)
+
+    def byte(self, offset):
+        if offset >= self.size:
+            raise IndexError('read past end of section')
+        b = self.buf[self.base + offset]
+        return b if isinstance(b, int) else ord(b)
+
+    def read(self, offset, size):
+        return self.buf[self.base + offset:self.base + min(offset + size, self.size)]
+
+    def cstring(self, offset):
+        """ return the null-terminated string at offset and the offset after
+            its terminator """
+        start = self.base + offset
+        end = self.buf.find(b'\0', start, self.base + self.size)
+        if end < 0:
+            raise IndexError('unterminated string')
+        return self.buf[start:end], end - self.base + 1
+
+def _section_data(buf, sections, name):
+    section = sections.get(name)
+    if section is None or section.type == SHT_NOBITS:
+        return None
+    if section.flags & SHF_COMPRESSED:
+        raise _Unsupported('compressed section %s' % name)
+    if section.offset + section.size > len(buf):
+        raise _Unsupported('section %s extends past end of file' % name)
+    return _SectionView(buf, section.offset, section.size)
+
+def _uleb128(buf, offset):
+    result = 0
+    shift = 0
+    while True:
+        byte = buf.byte(offset)
+        offset += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, offset
+        shift += 7
+
+def _sleb128(buf, offset):
+    result, new_offset = _uleb128(buf, offset)
+    bits = 7 * (new_offset - offset)
+    if result & (1 << (bits - 1)):
+        result -= 1 << bits
+    return result, new_offset
+
+class _UnitReader(object):
+    """ read the name of the top DIE of each unit in a .debug_info section """
+
+    def __init__(self, e, info, abbrev, strs, line_strs=None, str_offsets=None):
+        self.e = e
+        self.info = info
+        self.abbrev = abbrev
+        self.strs = strs
+        self.line_strs = line_strs
+        self.str_offsets = str_offsets
+        # abbreviation tables, by offset: {code: [(attribute, form, implicit_const)]}
+        self.abbrev_tables = {}
+
+    def _abbreviation(self, table_offset, code):
+        table = self.abbrev_tables.setdefault(table_offset, {'_next': table_offset})
+        # parse entries from where we last stopped, until we find the code:
+        offset = table['_next']
+        while code not in table and offset is not None:
+            entry_code, offset = _uleb128(self.abbrev, offset)
+            if entry_code == 0:
+                offset = None
+                break
+            tag, offset = _uleb128(self.abbrev, offset)
+            offset += 1 # children flag
+            attrs = []
+            while True:
+                attr, offset = _uleb128(self.abbrev, offset)
+                form, offset = _uleb128(self.abbrev, offset)
+                implicit_const = None
+                if form == DW_FORM_implicit_const:
+                    implicit_const, offset = _sleb128(self.abbrev, offset)
+                if attr == 0 and form == 0:
+                    break
+                attrs.append((attr, form, implicit_const))
+            table[entry_code] = attrs
+        table['_next'] = offset
+        if code not in table:
+            raise _Unsupported('abbreviation %d not found' % code)
+        return table[code]
+
+    def _form_value(self, form, offset, offset_size, address_size, version):
+        """ return (value, new_offset) for an attribute value of form at
+            offset, the value is only decoded for forms that can hold
+            strings, otherwise it's None """
+        e = self.e
+        info = self.info
+        off_fmt = 'Q' if offset_size == 8 else 'I'
+        if form in _Fixed_Size_Forms:
+            return None, offset + _Fixed_Size_Forms[form]
+        if form in (DW_FORM_strp, DW_FORM_line_strp):
+            value, = info.unpack(e + off_fmt, offset)
+            return (form, value), offset + offset_size
+        if form == DW_FORM_string:
+            return info.cstring(offset)
+        if form in (DW_FORM_strx, DW_FORM_GNU_str_index):
+            value, offset = _uleb128(info, offset)
+            return (DW_FORM_strx, value), offset
+        if DW_FORM_strx1 <= form <= DW_FORM_strx4:
+            size = form - DW_FORM_strx1 + 1
+            value = 0
+            for i in (range(size) if e == '>' else reversed(range(size))):
+                value = (value << 8) | info.byte(offset + i)
+            return (DW_FORM_strx, value), offset + size
+        if form in _Offset_Size_Forms:
+            return None, offset + offset_size
+        if form in _ULEB_Forms:
+            return None, _uleb128(info, offset)[1]
+        if form == 0x0d: # sdata
+            return None, _sleb128(info, offset)[1]
+        if form == 0x01: # addr
+            return None, offset + address_size
+        if form == 0x10: # ref_addr
+            return None, offset + (address_size if version == 2 else offset_size)
+        if form in _Block_Forms:
+            length_size = _Block_Forms[form]
+            if length_size is None:
+                length, offset = _uleb128(info, offset)
+            else:
+                length, = info.unpack(e + {1:'B', 2:'H', 4:'I'}[length_size], offset)
+                offset += length_size
+            return None, offset + length
+        if form == DW_FORM_indirect:
+            form, offset = _uleb128(info, offset)
+            return self._form_value(form, offset, offset_size, address_size, version)
+        raise _Unsupported('attribute form 0x%x' % form)
+
+    def _string(self, value, offset_size, str_offsets_base):
+        if isinstance(value, bytes):
+            return value
+        form, value = value
+        if form == DW_FORM_strp:
+            table = self.strs
+        elif form == DW_FORM_line_strp:
+            table = self.line_strs
+        else:
+            if self.str_offsets is None or str_offsets_base is None:
+                raise _Unsupported('string index without string offsets')
+            off_fmt = 'Q' if offset_size == 8 else 'I'
+            value, = self.str_offsets.unpack(
+                self.e + off_fmt, str_offsets_base + value * offset_size
+            )
+            table = self.strs
+        if table is None:
+            raise _Unsupported('missing string section')
+        return table.cstring(value)[0]
+
+    def iter_unit_names(self):
+        """ yield (name, comp_dir) as bytes (or None) for each unit """
+        e = self.e
+        info = self.info
+        offset = 0
+        end = len(info)
+        while offset + 4 <= end:
+            unit_length, = info.unpack(e + 'I', offset)
+            offset_size = 4
+            header = offset + 4
+            if unit_length == 0xffffffff:
+                unit_length, = info.unpack(e + 'Q', header)
+                offset_size = 8
+                header += 8
+            next_unit = header + unit_length
+            off_fmt = 'Q' if offset_size == 8 else 'I'
+            version, = info.unpack(e + 'H', header)
+            header += 2
+            if version >= 5:
+                unit_type, address_size = info.unpack('BB', header)
+                abbrev_offset, = info.unpack(e + off_fmt, header + 2)
+                header += 2 + offset_size
+                if unit_type in (4, 5): # skeleton, split_compile: dwo_id
+                    header += 8
+                elif unit_type in (2, 6): # type, split_type
+                    header += 8 + offset_size
+            elif version >= 2:
+                abbrev_offset, = info.unpack(e + off_fmt, header)
+                address_size, = info.unpack('B', header + offset_size)
+                header += offset_size + 1
+            else:
+                raise _Unsupported('DWARF version %d' % version)
+
+            code, die_offset = _uleb128(info, header)
+            if code != 0:
+                values = {}
+                for attr, form, implicit_const in self._abbreviation(abbrev_offset, code):
+                    value, die_offset = self._form_value(
+                        form, die_offset, offset_size, address_size, version
+                    )
+                    if attr in (DW_AT_name, DW_AT_comp_dir):
+                        values[attr] = value
+                    elif attr == DW_AT_str_offsets_base:
+                        values[attr] = info.unpack(e + off_fmt, die_offset - offset_size)[0]
+                str_offsets_base = values.get(DW_AT_str_offsets_base)
+                if str_offsets_base is None and self.str_offsets is not None:
+                    # split units don't have a base: their offsets follow the
+                    # (DWARF 5) header of the string offsets table
+                    str_offsets_base = 2 * offset_size if version >= 5 else 0
+                yield tuple(
+                    self._string(values[attr], offset_size, str_offsets_base)
+                    if values.get(attr) is not None else None
+                    for attr in (DW_AT_name, DW_AT_comp_dir)
+                )
+            offset = next_unit
+
+# sizes of attribute forms that don't depend on the unit:
+_Fixed_Size_Forms = {
+    0x05: 2, 0x06: 4, 0x07: 8,      # data2, data4, data8
+    0x0b: 1, 0x0c: 1,               # data1, flag
+    0x11: 1, 0x12: 2, 0x13: 4, 0x14: 8, # ref1, ref2, ref4, ref8
+    0x19: 0,                        # flag_present
+    0x1c: 4, 0x1e: 16, 0x20: 8,     # ref_sup4, data16, ref_sig8
+    0x21: 0,                        # implicit_const
+    0x24: 8,                        # ref_sup8
+    0x29: 1, 0x2a: 2, 0x2b: 3, 0x2c: 4, # addrx1-4
+}
+# forms that are offset-sized:
+_Offset_Size_Forms = (0x17, 0x1d, 0x1f20, 0x1f21) # sec_offset, strp_sup, GNU_ref_alt, GNU_strp_alt
+# forms that are a single uleb128:
+_ULEB_Forms = (0x0f, 0x15, 0x1b, 0x22, 0x23, 0x1f01) # udata, ref_udata, addrx, loclistx, rnglistx, GNU_addr_index
+# block forms: size of length field, or None for uleb128:
+_Block_Forms = {0x03: 2, 0x04: 4, 0x09: None, 0x0a: 1, 0x18: None}
+
+def _decode_path(value):
+    return value.decode('utf-8', 'replace') if value is not None else ''
+
+def _iter_files_fast(filename):
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise _NotELF()
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            sections, e = elf_sections(buf)
+            if any(name.startswith('.zdebug') for name in sections):
+                raise _Unsupported('compressed debug sections')
+            info = _section_data(buf, sections, '.debug_info')
+            if info is None:
+                logging.info("File does not have dwarf info, no sources in the project file")
+                return
+            abbrev = _section_data(buf, sections, '.debug_abbrev')
+            if abbrev is None:
+                raise _Unsupported('no .debug_abbrev')
+            reader = _UnitReader(e, info, abbrev,
+                _section_data(buf, sections, '.debug_str'),
+                _section_data(buf, sections, '.debug_line_str'),
+                _section_data(buf, sections, '.debug_str_offsets')
+            )
+            units = reader.iter_unit_names()
+            while True:
+                try:
+                    name, comp_dir = next(units)
+                except StopIteration:
+                    return
+                except (struct.error, IndexError) as e:
+                    raise _Unsupported('malformed DWARF: %s' % e)
+                yield os.path.join(_decode_path(comp_dir), _decode_path(name))
+        finally:
+            buf.close()
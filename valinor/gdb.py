@@ -8,20 +8,41 @@ import subprocess
 import logging
 import threading
 import signal
+import socket
+import time
 import traceback
-try:
-    import Queue
-except ImportError:
-    import queue as Queue
 
 logger = logging.getLogger('gdb')
 
+# port that the gdbserver listens on, the gdb startup files generated by
+# project_generator connect to this port
+Default_Port = 3333
+
+# maximum time to wait for the gdbserver to start listening (this includes
+# finding and connecting to the board)
+Server_Start_Timeout = 30.0
+
 def _ignoreSignal(signum, frame):
     logging.debug('ignoring signal %s, traceback:\n%s' % (
         signum, ''.join(traceback.format_list(traceback.extract_stack(frame)))
     ))
 
-def _launchPyOCDGDBServer(msg_queue):
+class _ServerEvents(object):
+    ''' events used to communicate between the gdbserver thread and the
+        thread launching gdb '''
+    def __init__(self):
+        # set by the server thread once it has started (alive is True), or
+        # failed to start (alive is False):
+        self.ready = threading.Event()
+        self.alive = False
+        # set by the launching thread to ask the server to stop:
+        self.stop = threading.Event()
+
+    def set_ready(self, alive):
+        self.alive = alive
+        self.ready.set()
+
+def _launchPyOCDGDBServer(events, port=Default_Port):
     logger.info('preparing PyOCD gdbserver...')
     from pyOCD.gdbserver import GDBServer
     from pyOCD.board import MbedBoard
@@ -33,24 +54,24 @@ def _launchPyOCDGDBServer(msg_queue):
             with board_selected as board:
                 logger.info('starting PyOCD gdbserver...')
                 gdb = GDBServer(
-                    board, 3333, {
+                    board, port, {
                          'break_at_hardfault': True,
                         'step_into_interrupt': False,
                              'break_on_reset': False,
+                    # the launcher checks the server is listening by
+                    # connecting to it, which must not shut it down:
+                                    'persist': True,
                     }
                 )
                 if gdb.isAlive():
-                    msg_queue.put('alive')
+                    events.set_ready(True)
+                    # wait for the parent to ask us to stop (which returns
+                    # immediately), checking periodically that the server
+                    # hasn't exited by itself
                     while gdb.isAlive():
-                        gdb.join(timeout = 0.5)
-                        # check for a "kill" message from the parent process:
-                        try:
-                            msg = msg_queue.get(False)
-                            if msg == 'kill':
-                                gdb.stop()
-                                break
-                        except Queue.Empty:
-                            pass
+                        if events.stop.wait(0.5):
+                            gdb.stop()
+                            break
         else:
             logger.error('failed to find a connected board')
     except Exception as e:
@@ -58,7 +79,32 @@ def _launchPyOCDGDBServer(msg_queue):
         if gdb != None:
             gdb.stop()
         raise
-    msg_queue.put('dead')
+    finally:
+        events.set_ready(False)
+
+def _isListening(port, host='localhost'):
+    ''' return True if something is accepting connections on port '''
+    try:
+        s = socket.create_connection((host, port), timeout=0.25)
+    except (socket.error, socket.timeout):
+        return False
+    s.close()
+    return True
+
+def _waitForServer(thread, events, port, timeout=Server_Start_Timeout):
+    ''' wait until the server in thread is accepting connections on port,
+        raise an exception if it fails to start '''
+    deadline = time.time() + timeout
+    events.ready.wait(timeout)
+    if not events.alive or not thread.is_alive():
+        raise Exception('gdb server failed to start')
+    # the server has been created, but it may not be listening yet:
+    while not _isListening(port):
+        if not events.alive or not thread.is_alive():
+            raise Exception('gdb server failed to start')
+        if time.time() > deadline:
+            raise Exception('gdb server did not start listening on port %d' % port)
+        time.sleep(0.01)
 
 def launcher(gdb_exe):
     def launch_gdb(projectfiles, executable):
@@ -69,37 +115,47 @@ def launcher(gdb_exe):
             cmd += ['-x', f]
         cmd.append(executable)
         # ignore Ctrl-C while gdb is running:
-        signal.signal(signal.SIGINT, _ignoreSignal);
-        child = subprocess.Popen(cmd)
-        child.wait()
+        previous_handler = signal.signal(signal.SIGINT, _ignoreSignal)
+        try:
+            child = subprocess.Popen(cmd)
+            child.wait()
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
     return launch_gdb
 
 def arm_none_eabi_launcher(gdb_exe):
     gdb_launcher = launcher(gdb_exe)
     def launch_arm_gdb(projectfiles, executable):
-        queue = Queue.Queue()
-        t = threading.Thread(target=_launchPyOCDGDBServer, args=(queue,))
+        # if a gdbserver daemon is running, it already has the board open:
+        from valinor import daemon
+        daemon_port = daemon.running_server()
+        if daemon_port == Default_Port:
+            logger.info('using the running gdbserver daemon on port %d', daemon_port)
+            gdb_launcher(projectfiles, executable)
+            return
+        elif daemon_port is not None:
+            logger.warning(
+                'the gdbserver daemon is listening on port %d, not port %d, so it can\'t be used',
+                daemon_port, Default_Port
+            )
+        events = _ServerEvents()
+        t = threading.Thread(target=_launchPyOCDGDBServer, args=(events, Default_Port))
         try:
             t.start()
-            # wait for an 'alive' message from the server before starting gdb
-            # itself:
-            msg = None
-            while msg != 'alive':
-                try:
-                    msg = queue.get(timeout=1.0)
-                except Queue.Empty as e:
-                    msg = None
-                    pass
-                if msg == 'dead' or not t.is_alive():
-                    raise Exception('gdb server failed to start')
+            # start gdb as soon as the server is listening:
+            _waitForServer(t, events, Default_Port)
         except KeyboardInterrupt as e:
             logger.error('stopped by user')
-            queue.put('kill')
+            events.stop.set()
+            t.join()
+            raise
+        except:
+            events.stop.set()
             t.join()
             raise
-        gdb_launcher(projectfiles, executable)
-        queue.put('kill')
-        t.join()
+        try:
+            gdb_launcher(projectfiles, executable)
+        finally:
+            events.stop.set()
+            t.join()
     return launch_arm_gdb
-
-
@@ -6,15 +6,13 @@
 
 import subprocess
 import logging
+import threading
+import hashlib
 import os
 
-from distutils.spawn import find_executable
-
-from project_generator import tools_supported
-from project_generator_definitions.definitions import ProGenDef
-
 from valinor.gdb import launcher as gdb_launcher
 from valinor.gdb import arm_none_eabi_launcher as arm_none_eabi_gdb_launcher
+from valinor import cache
 
 # cache the detected IDEs, (map of ide name to a function(projectfiles,
 # executable) that will launch it)
@@ -48,6 +46,15 @@ def _read_hklm_reg_value(key_path, value_name):
             winreg.CloseKey(k)
     return value
 
+def find_executable(name):
+    ''' return the path of the named executable on the PATH, or None '''
+    try:
+        from shutil import which
+    except ImportError:
+        # python 2
+        from distutils.spawn import find_executable as which
+    return which(name)
+
 def _find_uvision():
     found = find_executable('UV4')
     if found: return found
@@ -91,19 +98,105 @@ IDE_Scanners = {
     'arm_none_eabi_gdb': (_find_arm_none_eabi_gdb, arm_none_eabi_gdb_launcher),
 }
 
+# bump this if the scanners change in a way that makes earlier scan results
+# invalid
+_Scan_Cache_Version = 1
+
+def _scan_fingerprint(detected):
+    ''' fingerprint of the environment the scan results in detected (map of
+        ide name to path or None) depend on: the PATH, the modification times
+        of the directories in it (which change when an executable is
+        installed or removed), and the modification times of the executables
+        that were found. Returns None if any of them no longer exists. '''
+    h = hashlib.sha1()
+    h.update(os.environ.get('PATH', '').encode('utf-8'))
+    for d in os.environ.get('PATH', '').split(os.pathsep):
+        try:
+            h.update(repr(os.stat(d).st_mtime).encode('utf-8'))
+        except OSError:
+            h.update(b'-')
+    for ide in sorted(detected):
+        path = detected[ide]
+        h.update(('\0%s=%s' % (ide, path)).encode('utf-8'))
+        if path:
+            try:
+                h.update(repr(os.stat(path).st_mtime).encode('utf-8'))
+            except OSError:
+                return None
+    return h.hexdigest()
+
+def _scan_cache_key():
+    return 'v%d:%s:%s:%s' % (
+        _Scan_Cache_Version, os.name, ','.join(sorted(IDE_Scanners)),
+        hashlib.sha1(os.environ.get('PATH', '').encode('utf-8')).hexdigest()
+    )
+
+def _load_scan_results():
+    ''' return the map of ide name to path from a previous scan, if it is
+        still valid, or None '''
+    if cache.cache_disabled():
+        return None
+    record = cache.DiskCache('ide').get(_scan_cache_key())
+    if not record or 'detected' not in record:
+        return None
+    if record.get('fingerprint') != _scan_fingerprint(record['detected']):
+        logger.debug('IDE scan results are out of date')
+        return None
+    return record['detected']
+
+def _save_scan_results(detected):
+    if cache.cache_disabled():
+        return
+    cache.DiskCache('ide').set(_scan_cache_key(), {
+            'detected': detected,
+         'fingerprint': _scan_fingerprint(detected),
+    })
+
+def _scan():
+    ''' run all the scanners concurrently (they are io-bound), return a map
+        of ide name to the detected path, or None '''
+    # several IDEs share a scanner, only run each one once:
+    by_scanner = {}
+    for ide, (scanner, launcher) in IDE_Scanners.items():
+        by_scanner.setdefault(scanner, []).append(ide)
+
+    results = {}
+    def run(scanner, ides):
+        logger.debug('scanning for %s: %s', ', '.join(ides), scanner)
+        try:
+            detected = scanner()
+        except Exception as e:
+            logger.warning('error scanning for %s: %s', ', '.join(ides), e)
+            detected = None
+        for ide in ides:
+            logger.debug('scanning for %s... %sfound', ide, ('not ', '')[bool(detected)])
+            results[ide] = detected or None
+
+    threads = [
+        threading.Thread(target=run, args=(scanner, ides)) for scanner, ides in by_scanner.items()
+    ]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
 def _ensure_IDEs_scanned():
     global IDEs_Scanned, IDE_Launchers
     if IDEs_Scanned:
         return
 
-    # !!! could scan in parallel, should be worth it as scanners are
-    # likely highly io-bound
+    detected = _load_scan_results()
+    if detected is None:
+        detected = _scan()
+        _save_scan_results(detected)
+    else:
+        logger.debug('using cached IDE scan results')
+
     for ide, (scanner, launcher) in IDE_Scanners.items():
-        logger.debug('scanning for %s: %s', ide, (scanner, launcher))
-        detected = scanner()
-        logger.debug('scanning for %s... %sfound', ide, ('not ', '')[bool(detected)])
-        if detected:
-            IDE_Launchers[ide] = launcher(detected)
+        if detected.get(ide):
+            IDE_Launchers[ide] = launcher(detected[ide])
             # make sure we have a preference order for all detected IDEs, even
             # if the list hasn't been updated:
             if ide not in IDE_Preference:
@@ -121,6 +214,9 @@ def available():
 def select(available_ides, target, project_settings):
     ''' select the preferred option out of the available IDEs to debug the
     selected target, or None '''
+    from project_generator import tools_supported
+    from project_generator_definitions.definitions import ProGenDef
+
     possible_ides = []
     for ide in available_ides:
         tool = tools_supported.ToolsSupported().get_tool(ide)
@@ -139,6 +235,7 @@ def select(available_ides, target, project_settings):
 def get_launcher(ide):
     ''' return a function(projectfiles) that will launch the
     specified IDE when called, or None if that IDE cannot be found '''
+    _ensure_IDEs_scanned()
     if ide in IDE_Launchers:
         return IDE_Launchers[ide]
     else:
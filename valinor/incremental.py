@@ -0,0 +1,123 @@
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+''' Skip regenerating project files that are already up to date.
+
+A fingerprint of everything that the generated files depend on (the project
+data, target, tool, working directory and project_generator version) is
+stored in a stamp file next to the generated project files, along with the
+list of files that were generated. If the fingerprint hasn't changed, and
+the files still exist, generation is skipped entirely. Otherwise the project
+is regenerated, and any files whose contents didn't change get their
+previous modification times back, so IDEs that watch the project files don't
+reload them. '''
+
+import os
+import json
+import hashlib
+import logging
+
+from valinor import cache
+
+logger = logging.getLogger('incremental')
+
+# bump this if the stamp file format changes:
+_Stamp_Version = 1
+
+def stamp_path(projectfile_dir, name, tool):
+    ''' return the path of the stamp file for project name generated for tool
+        in projectfile_dir '''
+    return os.path.join(projectfile_dir or '.', '.%s.%s.valinor' % (name, tool))
+
+def fingerprint(name, tool, target, project_data):
+    ''' return a hex digest identifying everything that the project files
+        generated for tool depend on '''
+    h = hashlib.sha1()
+    h.update(json.dumps({
+                'version': _Stamp_Version,
+                   'name': name,
+                   'tool': tool,
+                 'target': target,
+           'project_data': project_data,
+                    'cwd': os.getcwd(),
+              'generator': cache.distribution_version('project_generator'),
+            'definitions': cache.distribution_version('project_generator_definitions'),
+        }, sort_keys=True).encode('utf-8')
+    )
+    return h.hexdigest()
+
+def _read_stamp(path):
+    try:
+        with open(path, 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        return None
+
+def _write_stamp(path, fp, projectfiles):
+    data = json.dumps({'fingerprint': fp, 'projectfiles': projectfiles}, sort_keys=True)
+    try:
+        cache.atomic_write(path, data.encode('utf-8'))
+    except (IOError, OSError) as e:
+        logger.warning('failed to write %s: %s', path, e)
+
+def _snapshot(paths):
+    ''' return {path: (contents, stat result)} for the existing paths '''
+    r = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            with open(path, 'rb') as f:
+                r[path] = (f.read(), st)
+        except (IOError, OSError):
+            pass
+    return r
+
+def _restore_unchanged(snapshot):
+    ''' restore the modification times of files that were rewritten with
+        the same contents, return the list of files that really changed '''
+    changed = []
+    for path, (contents, st) in snapshot.items():
+        try:
+            with open(path, 'rb') as f:
+                if f.read() != contents:
+                    changed.append(path)
+                    continue
+            if hasattr(st, 'st_mtime_ns'):
+                os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            else:
+                os.utime(path, (st.st_atime, st.st_mtime))
+        except (IOError, OSError):
+            changed.append(path)
+    return changed
+
+def generate(project, tool, target, project_data, projectfile_dir, force=False):
+    ''' generate project (a project_generator Project, created from
+        project_data) for tool, unless the files generated last time are
+        still up to date. Returns the generated project files in the form
+        returned by Project.get_generated_project_files, or None on failure.
+    '''
+    path = stamp_path(projectfile_dir, project.name, tool)
+    fp = fingerprint(project.name, tool, target, project_data)
+    stamp = _read_stamp(path)
+    previous_files = []
+    if stamp is not None:
+        previous_files = (stamp.get('projectfiles') or {}).get('files') or []
+        if not force and stamp.get('fingerprint') == fp and \
+           previous_files and all(os.path.isfile(f) for f in previous_files):
+            logger.info('project files for %s are up to date', tool)
+            return stamp['projectfiles']
+
+    snapshot = _snapshot(previous_files)
+    project.generate(tool)
+    projectfiles = project.get_generated_project_files(tool)
+    if not projectfiles:
+        return None
+    changed = _restore_unchanged(snapshot)
+    logger.debug('regenerated %s: %d of %d files changed', tool,
+        len(changed) + len([f for f in projectfiles['files'] if f not in snapshot]),
+        len(projectfiles['files'])
+    )
+    _write_stamp(path, fp, projectfiles)
+    return projectfiles
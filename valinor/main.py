@@ -16,24 +16,56 @@ import logging
 import argparse
 import os
 import sys
-import pkg_resources
-import shutil
 
 import valinor.logging_setup as logging_setup
-import valinor.ide_detection as ide_detection
-import valinor.elf as elf
-from project_generator.project import Project
-from project_generator.generate import Generator
-from project_generator.settings import ProjectSettings
+
+# Most modules are imported only when they're needed, so that startup is
+# fast, and --version and --help don't have to load project_generator at all.
+
+def _cache_command(argv):
+    import valinor.cache as cache
+    return cache.command(argv)
+
+def _batch_command(argv):
+    import valinor.batch as batch
+    return batch.command(argv)
+
+def _gdbserver_command(argv):
+    import valinor.daemon as daemon
+    return daemon.command(argv)
+
+# commands that can be given as the first argument, instead of the normal
+# "valinor [options] executable" usage, map of name to function(argv) that
+# returns an exit status
+Subcommands = {
+    'cache': _cache_command,
+    'batch': _batch_command,
+    'gdbserver': _gdbserver_command,
+}
+
+class _VersionAction(argparse.Action):
+    ''' like argparse's 'version' action, but only looks up the version when
+        it's requested '''
+    def __init__(self, option_strings, dest, help=None):
+        super(_VersionAction, self).__init__(option_strings=option_strings,
+            dest=dest, default=argparse.SUPPRESS, nargs=0, help=help
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        import valinor.cache as cache
+        print(cache.distribution_version('valinor'))
+        parser.exit()
 
 def main():
     logging_setup.init()
     logging.getLogger().setLevel(logging.INFO)
 
+    if len(sys.argv) > 1 and sys.argv[1] in Subcommands:
+        sys.exit(Subcommands[sys.argv[1]](sys.argv[2:]))
+
     p = argparse.ArgumentParser()
 
-    p.add_argument('--version', dest='show_version', action='version',
-        version=pkg_resources.require("valinor")[0].version,
+    p.add_argument('--version', dest='show_version', action=_VersionAction,
         help='display the version'
     )
 
@@ -55,6 +87,16 @@ def main():
              'necessary to proceed.'
     )
 
+    p.add_argument('-f', '--force', dest='force', default=False, action='store_true',
+        help='Regenerate the project files even if the ones generated by a '+
+             'previous run are up to date.'
+    )
+
+    p.add_argument('--no-cache', dest='use_cache', default=True, action='store_false',
+        help='Always read the source file list from the executable, instead '+
+             'of using the cached list from a previous run.'
+    )
+
     p.add_argument('--target', dest='target', required=True,
         help='The target board to generate a project file for (e.g. K64F).'
     )
@@ -65,11 +107,57 @@ def main():
 
     args = p.parse_args()
 
+    import valinor.ide_detection as ide_detection
+
+    try:
+        generated = generate_project(args.executable, args.target, args.ide_tool,
+            args.project_dir, use_cache=args.use_cache, force=args.force
+        )
+    except GenerationError as e:
+        logging.error('%s', e)
+        sys.exit(1)
+    projectfiles = generated['projectfiles']
+
+    if args.start_session:
+        launch_fn = ide_detection.get_launcher(generated['tool'])
+        if launch_fn is not None:
+            try:
+                launch_fn(projectfiles['files'], generated['executable'])
+            except Exception as e:
+                logging.error('failed to launch debugger: %s', e)
+        else:
+            logging.warning('failed to open IDE')
+    print('project files have been generated in: %s' % os.path.join(os.getcwd(), os.path.normpath(projectfiles['path'])))
+
+
+class GenerationError(Exception):
+    ''' raised by generate_project when the project can't be generated '''
+    pass
+
+def generate_project(executable, target, ide_tool=None, project_dir=None, use_cache=True, force=False):
+    ''' generate the project files needed to debug executable on target with
+        ide_tool (or the preferred detected IDE if ide_tool is None), in
+        project_dir (or the directory of the executable if None).
+
+        Returns a dictionary with the 'tool' used, the 'executable' that
+        should be passed to the debugger (which may be a copy of the
+        original), and the generated 'projectfiles' (as returned by
+        project_generator's Project.get_generated_project_files).
+
+        Raises GenerationError on failure.
+    '''
+    import shutil
+    import valinor.ide_detection as ide_detection
+    import valinor.elf as elf
+    import valinor.incremental as incremental
+    from project_generator.project import Project
+    from project_generator.generate import Generator
+    from project_generator.settings import ProjectSettings
+
     # check that the executable exists before we proceed, so we get a nice
     # error message if it doesn't
-    if not os.path.isfile(args.executable):
-        logging.error('cannot debug file "%s" that does not exist' % args.executable)
-        sys.exit(1)
+    if not os.path.isfile(executable):
+        raise GenerationError('cannot debug file "%s" that does not exist' % executable)
 
     # Get setttings and generator (it updates targets def prior select)
     projects = {
@@ -78,38 +166,36 @@ def main():
     generator = Generator(projects)
     project_settings = ProjectSettings()
 
-    available_ides = ide_detection.available()
-    ide_tool = args.ide_tool
     if not ide_tool:
-        ide_tool = ide_detection.select(available_ides, args.target, project_settings)
+        available_ides = ide_detection.available()
+        ide_tool = ide_detection.select(available_ides, target, project_settings)
         if ide_tool is None:
             if len(available_ides):
-                logging.error('None of the detected IDEs supports "%s"', args.target)
+                logging.error('None of the detected IDEs supports "%s"', target)
             else:
                 logging.error('No IDEs were detected on this system!')
             logging.info('Searched for:\n  %s', '\n  '.join(ide_detection.IDE_Preference))
     if ide_tool is None:
-        logging.error(
-            'No IDE tool available for target "%s". Please see '+
+        raise GenerationError(
+            ('No IDE tool available for target "%s". Please see '+
             'https://github.com/project-generator/project_generator for details '+
-            'on adding support.', args.target
+            'on adding support.') % target
         )
-        sys.exit(1)
 
-    file_name      = os.path.split(args.executable)[1]
+    file_name      = os.path.split(executable)[1]
     file_base_name = os.path.splitext(file_name)[0]
-    executable_dir = os.path.dirname(args.executable)
+    executable_dir = os.path.dirname(executable)
 
-    projectfile_dir = args.project_dir or executable_dir
+    projectfile_dir = project_dir or executable_dir
 
-    files = elf.get_files_from_executable(args.executable)
+    files = elf.get_files_from_executable(executable, use_cache)
 
     # pass empty data to the tool for things we don't care about when just
     # debugging (in the future we could add source files by reading the debug
     # info from the file being debugged)
     project_data = {
         'common': {
-            'target': [args.target],  # target
+            'target': [target],  # target
             'build_dir': ['.'],
             'linker_file': ['None'],
             'export_dir': ['.' + os.path.sep + projectfile_dir],
@@ -117,33 +203,27 @@ def main():
                 'rel_path' : [''],
                 'path' : [os.path.relpath(executable_dir, projectfile_dir) + os.path.sep],
             },
-            'sources': {'Source_Files':sorted([f for f in files], key=lambda file: os.path.basename(file))},
+            'sources': {'Source_Files':sorted(files, key=lambda file: os.path.basename(file))},
         }
     }
 
     project = Project(file_base_name, [project_data], project_settings)
-    project.generate(ide_tool)
+    projectfiles = incremental.generate(
+        project, ide_tool, target, project_data, projectfile_dir, force=force
+    )
 
     # perform any modifications to the executable itself that are necessary to
     # debug it (for example, to debug an ELF with Keil uVision, it must be
     # renamed to have the .axf extension)
-    executable = args.executable
     if ide_tool in ('uvision', 'uvision5'):
-        new_exe_path = args.executable + '.axf'
-        shutil.copy(args.executable, new_exe_path)
+        new_exe_path = executable + '.axf'
+        shutil.copy(executable, new_exe_path)
         executable = new_exe_path
-    projectfiles = project.get_generated_project_files(ide_tool)
     if not projectfiles:
-        logging.error("failed to generate project files")
-        sys.exit(1)
+        raise GenerationError("failed to generate project files")
 
-    if args.start_session:
-        launch_fn = ide_detection.get_launcher(ide_tool)
-        if launch_fn is not None:
-            try:
-                launch_fn(projectfiles['files'], executable)
-            except Exception as e:
-                logging.error('failed to launch debugger: %s', e)
-        else:
-            logging.warning('failed to open IDE')
-    print('project files have been generated in: %s' % os.path.join(os.getcwd(), os.path.normpath(projectfiles['path'])))
+    return {
+                'tool': ide_tool,
+          'executable': executable,
+        'projectfiles': projectfiles,
+    }
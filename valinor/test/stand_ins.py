@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+''' Stand-ins for gdb and the PyOCD gdbserver, so that debug sessions can be
+tested without a debugger or a board. '''
+
+# standard library modules, , ,
+import os
+import sys
+import socket
+import time
+import threading
+
+# stands in for arm-none-eabi-gdb: connects to the server port given in the
+# first command file, and records the time it did so
+_Fake_GDB = """#!%s
+import sys, socket, time
+port = int(open(sys.argv[2]).read().strip().split(':')[-1])
+s = socket.create_connection(('localhost', port))
+s.close()
+with open(sys.argv[-1] + '.connected', 'a') as f:
+    f.write(repr(time.time()) + '\\n')
+"""
+
+def write_fake_gdb(path):
+    ''' write an executable stand-in for gdb to path '''
+    with open(path, 'w') as f:
+        f.write(_Fake_GDB % sys.executable)
+    os.chmod(path, 0o755)
+
+def gdb_connection_times(executable):
+    ''' return the times at which the fake gdb connected when debugging
+        executable '''
+    with open(executable + '.connected') as f:
+        return [float(x) for x in f.read().split()]
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('localhost', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+class StandInServer(object):
+    ''' a replacement for valinor.gdb._launchPyOCDGDBServer: takes a while
+        to "connect to the board", then a while longer before it's listening,
+        and accepts connections until it is stopped '''
+    def __init__(self, connect_delay=0.05, listen_delay=0.2):
+        self.connect_delay = connect_delay
+        self.listen_delay = listen_delay
+        self.times = {}
+        self.launches = 0
+        self.connections = 0
+
+    def __call__(self, events, port):
+        self.launches += 1
+        time.sleep(self.connect_delay)
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            events.set_ready(True)
+            time.sleep(self.listen_delay)
+            server.bind(('localhost', port))
+            server.listen(5)
+            self.times['listening'] = time.time()
+            t = threading.Thread(target=self._accept, args=(server,))
+            t.daemon = True
+            t.start()
+            events.stop.wait()
+            self.times['stopped'] = time.time()
+        finally:
+            server.close()
+            events.set_ready(False)
+
+    def _accept(self, server):
+        while True:
+            try:
+                conn, addr = server.accept()
+            except socket.error:
+                return
+            self.connections += 1
+            conn.close()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+''' Write small synthetic ELF files with DWARF debug information, so that
+tests don't depend on a cross compiler being installed. '''
+
+# standard library modules, , ,
+import struct
+
+SHT_NULL     = 0
+SHT_PROGBITS = 1
+SHT_SYMTAB   = 2
+SHT_STRTAB   = 3
+SHT_NOBITS   = 8
+SHT_NOTE     = 7
+
+SHF_WRITE     = 0x1
+SHF_ALLOC     = 0x2
+SHF_EXECINSTR = 0x4
+
+DW_TAG_compile_unit = 0x11
+DW_TAG_subprogram   = 0x2e
+DW_AT_name          = 0x03
+DW_AT_comp_dir      = 0x1b
+DW_AT_producer      = 0x25
+DW_AT_low_pc        = 0x11
+DW_AT_high_pc       = 0x12
+DW_AT_language      = 0x13
+DW_FORM_addr        = 0x01
+DW_FORM_data4       = 0x06
+DW_FORM_string      = 0x08
+DW_FORM_data1       = 0x0b
+DW_FORM_strp        = 0x0e
+
+class Section(object):
+    ''' A section to be written into an ELF file. If data is None the
+        section is size zero bytes, written as a hole in the file (so that
+        large images can be created cheaply). '''
+    def __init__(self, name, data=None, size=None, type=SHT_PROGBITS, flags=0,
+                 addr=0, link=0, info=0, entsize=0, align=1):
+        self.name = name
+        self.data = data
+        self.size = len(data) if data is not None else (size or 0)
+        self.type = type
+        self.flags = flags
+        self.addr = addr
+        self.link = link
+        self.info = info
+        self.entsize = entsize
+        self.align = align
+
+def uleb128(value):
+    r = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            r.append(byte | 0x80)
+        else:
+            r.append(byte)
+            return bytes(r)
+
+def write_elf(path, sections, elfclass=32, little_endian=True, machine=40, elftype=2):
+    ''' write an ELF file containing sections (a list of Section), with a
+        section header string table added automatically '''
+    e = '<' if little_endian else '>'
+    is64 = elfclass == 64
+    ehsize = 64 if is64 else 52
+    shentsize = 64 if is64 else 40
+
+    shstrtab = bytearray(b'\0')
+    name_offsets = []
+    for s in sections:
+        name_offsets.append(len(shstrtab))
+        shstrtab += s.name.encode('ascii') + b'\0'
+    shstrtab_name = len(shstrtab)
+    shstrtab += b'.shstrtab\0'
+    all_sections = list(sections) + [Section('.shstrtab', bytes(shstrtab), type=SHT_STRTAB)]
+    name_offsets.append(shstrtab_name)
+
+    # lay out section contents after the ELF header:
+    offsets = []
+    pos = ehsize
+    for s in all_sections:
+        align = max(s.align, 1)
+        pos = (pos + align - 1) // align * align
+        offsets.append(pos)
+        if s.type != SHT_NOBITS:
+            pos += s.size
+    shoff = (pos + 7) // 8 * 8
+    shnum = len(all_sections) + 1
+
+    ident = b'\x7fELF' + struct.pack('BBBB', 2 if is64 else 1, 1 if little_endian else 2, 1, 0) + b'\0' * 8
+    if is64:
+        header = ident + struct.pack(e + 'HHIQQQIHHHHHH',
+            elftype, machine, 1, 0, 0, shoff, 0, ehsize, 0, 0, shentsize, shnum, shnum - 1
+        )
+    else:
+        header = ident + struct.pack(e + 'HHIIIIIHHHHHH',
+            elftype, machine, 1, 0, 0, shoff, 0, ehsize, 0, 0, shentsize, shnum, shnum - 1
+        )
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        for s, offset in zip(all_sections, offsets):
+            if s.data is not None:
+                f.seek(offset)
+                f.write(s.data)
+        f.seek(shoff)
+        f.write(b'\0' * shentsize)
+        for s, name, offset in zip(all_sections, name_offsets, offsets):
+            if is64:
+                f.write(struct.pack(e + 'IIQQQQIIQQ',
+                    name, s.type, s.flags, s.addr, offset, s.size, s.link, s.info, s.align, s.entsize
+                ))
+            else:
+                f.write(struct.pack(e + 'IIIIIIIIII',
+                    name, s.type, s.flags, s.addr, offset, s.size, s.link, s.info, s.align, s.entsize
+                ))
+
+def debug_sections(cus, version=4, offset_size=4, address_size=4, little_endian=True,
+                   children=2, inline_comp_dir=True):
+    ''' return the .debug_abbrev, .debug_info and .debug_str sections
+        describing a compilation unit for each (name, comp_dir) in cus. Each
+        unit gets some child DIEs that a reader listing sources must skip. '''
+    e = '<' if little_endian else '>'
+    off_fmt = 'Q' if offset_size == 8 else 'I'
+    addr_fmt = 'Q' if address_size == 8 else 'I'
+
+    # one abbreviation table shared by all units: code 1 is the unit DIE,
+    # code 2 a childless subprogram
+    comp_dir_form = DW_FORM_string if inline_comp_dir else DW_FORM_strp
+    abbrev = bytearray()
+    abbrev += uleb128(1) + uleb128(DW_TAG_compile_unit) + b'\x01'
+    for attr, form in ((DW_AT_producer, DW_FORM_strp), (DW_AT_language, DW_FORM_data1),
+                       (DW_AT_name, DW_FORM_strp), (DW_AT_comp_dir, comp_dir_form),
+                       (DW_AT_low_pc, DW_FORM_addr), (DW_AT_high_pc, DW_FORM_data4)):
+        abbrev += uleb128(attr) + uleb128(form)
+    abbrev += b'\0\0'
+    abbrev += uleb128(2) + uleb128(DW_TAG_subprogram) + b'\x00'
+    for attr, form in ((DW_AT_name, DW_FORM_string), (DW_AT_low_pc, DW_FORM_addr),
+                       (DW_AT_high_pc, DW_FORM_data4)):
+        abbrev += uleb128(attr) + uleb128(form)
+    abbrev += b'\0\0'
+    abbrev += b'\0'
+
+    strtab = bytearray(b'synthetic producer\0')
+    string_offsets = {}
+    def strp(s):
+        if s not in string_offsets:
+            string_offsets[s] = len(strtab)
+            strtab.extend(s.encode('utf-8') + b'\0')
+        return struct.pack(e + off_fmt, string_offsets[s])
+
+    info = bytearray()
+    for i, (name, comp_dir) in enumerate(cus):
+        die = bytearray(uleb128(1))
+        die += struct.pack(e + off_fmt, 0)
+        die += b'\x0c'
+        die += strp(name)
+        if inline_comp_dir:
+            die += comp_dir.encode('utf-8') + b'\0'
+        else:
+            die += strp(comp_dir)
+        die += struct.pack(e + addr_fmt + 'I', 0x1000 * i, 0x100)
+        for c in range(children):
+            die += uleb128(2) + ('function_%d_%d' % (i, c)).encode('ascii') + b'\0'
+            die += struct.pack(e + addr_fmt + 'I', 0x1000 * i + 0x10 * c, 0x10)
+        die += b'\0'
+
+        if version >= 5:
+            # unit_type DW_UT_compile, address_size, debug_abbrev_offset
+            header = struct.pack(e + 'HBB' + off_fmt, version, 1, address_size, 0)
+        else:
+            header = struct.pack(e + 'H' + off_fmt + 'B', version, 0, address_size)
+        body = header + bytes(die)
+        if offset_size == 8:
+            info += struct.pack(e + 'IQ', 0xffffffff, len(body))
+        else:
+            info += struct.pack(e + 'I', len(body))
+        info += body
+
+    return [
+        Section('.debug_abbrev', bytes(abbrev)),
+        Section('.debug_info', bytes(info)),
+        Section('.debug_str', bytes(strtab), flags=0x30, entsize=1),
+    ]
+
+def write_dwarf_elf(path, cus, text_size=0x100, **kwargs):
+    ''' write an ELF file at path with a .text section of text_size bytes and
+        DWARF information for compilation units cus (see debug_sections) '''
+    elfclass = kwargs.pop('elfclass', 32)
+    little_endian = kwargs.get('little_endian', True)
+    sections = [
+        Section('.text', size=text_size, flags=SHF_ALLOC | SHF_EXECINSTR, addr=0x0, align=4),
+    ] + debug_sections(cus, **kwargs)
+    write_elf(path, sections, elfclass=elfclass, little_endian=little_endian)
+
+def numbered_cus(count, comp_dir='/build/project'):
+    ''' return count (name, comp_dir) pairs with distinct names '''
+    return [('source/file_%05d.c' % i, comp_dir) for i in range(count)]
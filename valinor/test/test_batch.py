@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+import tempfile
+import shutil
+import json
+
+# internal modules:
+from . import cli
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.workingdir = tempfile.mkdtemp()
+        for name in ('one', 'two'):
+            os.makedirs(os.path.join(self.workingdir, name))
+            with open(os.path.join(self.workingdir, name, 'myexe'), 'w') as f:
+                f.write('ELF')
+
+    def tearDown(self):
+        shutil.rmtree(self.workingdir)
+
+    def testBatch(self):
+        manifest = [
+            {'executable': os.path.join('one', 'myexe'), 'target': 'K64F', 'tool': 'uvision'},
+            {'executable': os.path.join('two', 'myexe'), 'target': 'K64F', 'tool': 'arm_none_eabi_gdb',
+             'project_dir': 'proj'},
+            {'executable': os.path.join('three', 'myexe'), 'target': 'K64F', 'tool': 'uvision'},
+        ]
+        with open(os.path.join(self.workingdir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+        out, err, status = cli.run(
+            ['batch', 'manifest.json', '-j', '2', '--report', 'report.json'], cwd=self.workingdir
+        )
+        print(out)
+        print(err)
+        # one entry fails, so the exit status is failure:
+        self.assertEqual(status, 1)
+        self.assertIn('2 generated, 1 failed', out)
+        self.assertTrue(os.path.isfile(os.path.join(self.workingdir, 'one', 'myexe.uvproj')))
+        self.assertTrue(os.path.isfile(os.path.join(self.workingdir, 'proj', 'myexe.gdbstartup')))
+
+        with open(os.path.join(self.workingdir, 'report.json')) as f:
+            report = json.load(f)
+        self.assertEqual([r['status'] for r in report], ['ok', 'ok', 'failed'])
+        self.assertEqual(report[1]['path'], 'proj')
+        self.assertIn('does not exist', report[2]['error'])
+
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+import tempfile
+import shutil
+
+# internal modules:
+from valinor import cache
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.workingdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workingdir)
+
+    def testGetSet(self):
+        c = cache.DiskCache('test', root=self.workingdir)
+        self.assertEqual(c.get('a'), None)
+        self.assertEqual(c.get('a', []), [])
+        c.set('a', ['x.c', 'y.c'])
+        self.assertEqual(c.get('a'), ['x.c', 'y.c'])
+        self.assertEqual(len(c.entries()), 1)
+
+    def testLRUEviction(self):
+        c = cache.DiskCache('test', root=self.workingdir, max_size=400)
+        for i, key in enumerate(('a', 'b', 'c')):
+            c.set(key, 'v' * 100)
+            # make sure the last-used times are distinct:
+            os.utime(c._entry_path(key), (1000 + i, 1000 + i))
+        # use 'a', so 'b' becomes the least recently used:
+        self.assertEqual(c.get('a'), 'v' * 100)
+        c.set('d', 'v' * 100)
+        self.assertEqual(c.get('b'), None)
+        self.assertEqual(c.get('a'), 'v' * 100)
+        self.assertEqual(c.get('d'), 'v' * 100)
+        self.assertTrue(c.size() <= 400)
+
+    def testClear(self):
+        c = cache.DiskCache('test', root=self.workingdir)
+        c.set('a', 1)
+        c.set('b', 2)
+        self.assertEqual(c.clear(), 2)
+        self.assertEqual(c.get('a'), None)
+        self.assertEqual(c.size(), 0)
+
+    def testExecutableKey(self):
+        exe_path = os.path.join(self.workingdir, 'myexe')
+        with open(exe_path, 'wb') as f:
+            f.write(b'not an ELF')
+        key = cache.executable_key(exe_path)
+        self.assertTrue(key.startswith('content:'))
+        self.assertEqual(key, cache.executable_key(exe_path))
+        with open(exe_path, 'wb') as f:
+            f.write(b'not an ELF either')
+        self.assertNotEqual(key, cache.executable_key(exe_path))
+
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+import tempfile
+import shutil
+import threading
+import time
+
+# internal modules:
+from valinor import gdb
+from valinor import daemon
+from . import stand_ins
+
+class TestGDBServerDaemon(unittest.TestCase):
+    def setUp(self):
+        if os.name == 'nt':
+            self.skipTest('needs an executable script as a stand-in for gdb')
+        self.workingdir = tempfile.mkdtemp()
+        self.saved_environ = dict(os.environ)
+        os.environ['VALINOR_STATE_DIR'] = self.workingdir
+
+        self.port = stand_ins.free_port()
+        self.gdb_exe = os.path.join(self.workingdir, 'fake-gdb')
+        stand_ins.write_fake_gdb(self.gdb_exe)
+        self.startup_file = os.path.join(self.workingdir, 'myexe.gdbstartup')
+        with open(self.startup_file, 'w') as f:
+            f.write('target remote localhost:%d\n' % self.port)
+        self.executable = os.path.join(self.workingdir, 'myexe')
+
+        self.saved = (gdb._launchPyOCDGDBServer, gdb.Default_Port)
+        self.server = stand_ins.StandInServer()
+        gdb._launchPyOCDGDBServer = self.server
+        gdb.Default_Port = self.port
+
+    def tearDown(self):
+        daemon.request('stop')
+        gdb._launchPyOCDGDBServer, gdb.Default_Port = self.saved
+        os.environ.clear()
+        os.environ.update(self.saved_environ)
+        shutil.rmtree(self.workingdir)
+
+    def startDaemon(self):
+        result = []
+        t = threading.Thread(target=lambda: result.append(daemon.serve(self.port)))
+        t.daemon = True
+        t.start()
+        deadline = time.time() + 10
+        while daemon.request('status') is None:
+            self.assertTrue(t.is_alive() and time.time() < deadline)
+            time.sleep(0.01)
+        return t, result
+
+    def testNotRunning(self):
+        self.assertEqual(daemon.request('status'), None)
+        self.assertEqual(daemon.running_server(), None)
+
+    def testSessionsShareServer(self):
+        t, result = self.startDaemon()
+        status = daemon.request('status')
+        self.assertEqual(status['gdb_port'], self.port)
+        self.assertTrue(status['alive'])
+        self.assertEqual(daemon.running_server(), self.port)
+
+        launch = gdb.arm_none_eabi_launcher(self.gdb_exe)
+        launch([self.startup_file], self.executable)
+        launch([self.startup_file], self.executable)
+        self.assertEqual(len(stand_ins.gdb_connection_times(self.executable)), 2)
+        # the board was only opened once:
+        self.assertEqual(self.server.launches, 1)
+
+        self.assertEqual(daemon.request('stop'), {'stopping': True})
+        t.join(5)
+        self.assertFalse(t.is_alive())
+        self.assertEqual(result, [0])
+        self.assertFalse(os.path.exists(daemon.state_path()))
+        self.assertEqual(daemon.request('status'), None)
+
+    def testRejectsWrongToken(self):
+        t, result = self.startDaemon()
+        state = daemon._read_state()
+        token = state['token']
+        state['token'] = 'wrong'
+        daemon._write_state(state)
+        self.assertEqual(daemon.request('stop'), {'error': 'not authorised'})
+        self.assertTrue(t.is_alive())
+        state['token'] = token
+        daemon._write_state(state)
+        daemon.request('stop')
+        t.join(5)
+        self.assertFalse(t.is_alive())
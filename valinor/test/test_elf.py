@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+import tempfile
+import shutil
+import subprocess
+import sys
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# internal modules:
+from valinor import elf
+from . import synthetic_elf
+
+class TestSourcesFromELF(unittest.TestCase):
+    def setUp(self):
+        self.workingdir = tempfile.mkdtemp()
+        self.exe_path = os.path.join(self.workingdir, 'myexe')
+
+    def tearDown(self):
+        shutil.rmtree(self.workingdir)
+
+    def checkMatchesPyelftools(self, **kwargs):
+        cus = synthetic_elf.numbered_cus(20)
+        synthetic_elf.write_dwarf_elf(self.exe_path, cus, **kwargs)
+        files = list(elf._iter_files_fast(self.exe_path))
+        self.assertEqual(files, [os.path.join(comp_dir, name) for name, comp_dir in cus])
+        self.assertEqual(files, list(elf._iter_files_pyelftools(self.exe_path)))
+
+    def testDWARF4(self):
+        self.checkMatchesPyelftools()
+
+    def testDWARF2(self):
+        self.checkMatchesPyelftools(version=2)
+
+    def testDWARF5(self):
+        self.checkMatchesPyelftools(version=5)
+
+    def testDWARF64(self):
+        self.checkMatchesPyelftools(elfclass=64, offset_size=8, address_size=8)
+
+    def testBigEndian(self):
+        self.checkMatchesPyelftools(little_endian=False)
+
+    def testStringTableCompDir(self):
+        self.checkMatchesPyelftools(inline_comp_dir=False)
+
+    def testNoDWARF(self):
+        synthetic_elf.write_elf(self.exe_path, [synthetic_elf.Section('.text', b'\0' * 16)])
+        self.assertEqual(elf.get_files_from_executable(self.exe_path, use_cache=False), [])
+
+    def testNotELF(self):
+        with open(self.exe_path, 'wb') as f:
+            f.write(b'ELF')
+        self.assertEqual(elf.get_files_from_executable(self.exe_path, use_cache=False), [])
+
+# measure the growth in peak RSS (in KB) while iterating over the sources in
+# an executable, in a fresh process so earlier tests don't affect the peak
+_Measure_RSS_Script = """
+import sys, resource
+sys.path.insert(0, sys.argv[2])
+import valinor.elf as elf
+def peak_kb():
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r // 1024 if sys.platform == 'darwin' else r
+before = peak_kb()
+count = 0
+for path in elf.iter_files_from_executable(sys.argv[1]):
+    count += 1
+print('%d %d' % (count, peak_kb() - before))
+"""
+
+class TestStreamingMemory(unittest.TestCase):
+    # peak memory growth allowed while scanning, independent of image size:
+    Budget_KB = 24 * 1024
+
+    def setUp(self):
+        if resource is None:
+            self.skipTest('resource module not available')
+        self.workingdir = tempfile.mkdtemp()
+        self.exe_path = os.path.join(self.workingdir, 'large.elf')
+
+    def tearDown(self):
+        shutil.rmtree(self.workingdir)
+
+    def measure(self):
+        progdir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..')
+        out = subprocess.check_output(
+            [sys.executable, '-c', _Measure_RSS_Script, self.exe_path, progdir]
+        )
+        count, growth_kb = [int(x) for x in out.decode('utf-8').split()]
+        return count, growth_kb
+
+    def testLargeImagePeakRSS(self):
+        # 20k compilation units and a 512MB (sparse) text section
+        synthetic_elf.write_dwarf_elf(self.exe_path,
+            synthetic_elf.numbered_cus(20000), text_size=512 * 1024 * 1024, children=8
+        )
+        count, growth_kb = self.measure()
+        self.assertEqual(count, 20000)
+        self.assertTrue(growth_kb < self.Budget_KB,
+            'peak RSS grew by %dKB, budget is %dKB' % (growth_kb, self.Budget_KB)
+        )
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+import tempfile
+import shutil
+import time
+
+# internal modules:
+from valinor import gdb
+from . import stand_ins
+
+class TestGDBServerLifecycle(unittest.TestCase):
+    def setUp(self):
+        if os.name == 'nt':
+            self.skipTest('needs an executable script as a stand-in for gdb')
+        self.workingdir = tempfile.mkdtemp()
+        self.port = stand_ins.free_port()
+        self.gdb_exe = os.path.join(self.workingdir, 'fake-gdb')
+        stand_ins.write_fake_gdb(self.gdb_exe)
+        self.startup_file = os.path.join(self.workingdir, 'myexe.gdbstartup')
+        with open(self.startup_file, 'w') as f:
+            f.write('target remote localhost:%d\n' % self.port)
+        self.executable = os.path.join(self.workingdir, 'myexe')
+
+        # make sure no gdbserver daemon is found:
+        self.saved_environ = dict(os.environ)
+        os.environ['VALINOR_STATE_DIR'] = self.workingdir
+
+        self.saved = (gdb._launchPyOCDGDBServer, gdb.Default_Port)
+        self.server = stand_ins.StandInServer()
+        gdb._launchPyOCDGDBServer = self.server
+        gdb.Default_Port = self.port
+
+    def tearDown(self):
+        gdb._launchPyOCDGDBServer, gdb.Default_Port = self.saved
+        os.environ.clear()
+        os.environ.update(self.saved_environ)
+        shutil.rmtree(self.workingdir)
+
+    def testStartsGDBWhenListening(self):
+        launch = gdb.arm_none_eabi_launcher(self.gdb_exe)
+        launch([self.startup_file], self.executable)
+        returned = time.time()
+
+        connected, = stand_ins.gdb_connection_times(self.executable)
+        # gdb must connect after the server was listening, and without
+        # waiting for a polling interval:
+        self.assertTrue(connected >= self.server.times['listening'])
+        self.assertTrue(connected - self.server.times['listening'] < 0.5)
+        # the server is stopped as soon as gdb exits:
+        self.assertTrue(self.server.times['stopped'] - connected < 0.2)
+        self.assertTrue(returned - connected < 0.3)
+
+    def testServerFailsToStart(self):
+        def failingServer(events, port):
+            events.set_ready(False)
+        gdb._launchPyOCDGDBServer = failingServer
+        launch = gdb.arm_none_eabi_launcher(self.gdb_exe)
+        start = time.time()
+        self.assertRaises(Exception, launch, [self.startup_file], self.executable)
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertFalse(os.path.exists(self.executable + '.connected'))
+
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+import tempfile
+import shutil
+import threading
+import time
+
+# internal modules:
+from valinor import ide_detection
+
+class TestIDEScan(unittest.TestCase):
+    def setUp(self):
+        self.workingdir = tempfile.mkdtemp()
+        self.bindir = os.path.join(self.workingdir, 'bin')
+        os.makedirs(self.bindir)
+        self.tool_path = os.path.join(self.bindir, 'fake-gdb')
+        with open(self.tool_path, 'w') as f:
+            f.write('#!/bin/sh\n')
+
+        self.saved_environ = dict(os.environ)
+        os.environ['VALINOR_CACHE_DIR'] = os.path.join(self.workingdir, 'cache')
+        os.environ['PATH'] = self.bindir
+        os.environ.pop('VALINOR_NO_CACHE', None)
+
+        self.saved_scanners = dict(ide_detection.IDE_Scanners)
+        self.scans = []
+        self.scan_lock = threading.Lock()
+        def found():
+            self.recordScan('found')
+            return self.tool_path
+        def not_found():
+            self.recordScan('not_found')
+            return None
+        launcher = lambda path: (lambda projectfiles, executable: path)
+        ide_detection.IDE_Scanners.clear()
+        ide_detection.IDE_Scanners.update({
+            'fake_gdb': (found, launcher),
+             'missing': (not_found, launcher),
+        })
+        self.reset()
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.saved_environ)
+        ide_detection.IDE_Scanners.clear()
+        ide_detection.IDE_Scanners.update(self.saved_scanners)
+        self.reset()
+        shutil.rmtree(self.workingdir)
+
+    def recordScan(self, name):
+        # sleep so that scans which aren't concurrent take measurably longer
+        time.sleep(0.2)
+        with self.scan_lock:
+            self.scans.append(name)
+
+    def reset(self):
+        ide_detection.IDEs_Scanned = False
+        ide_detection.IDE_Launchers.clear()
+
+    def testScansConcurrently(self):
+        start = time.time()
+        self.assertEqual(ide_detection.available(), ['fake_gdb'])
+        self.assertTrue(time.time() - start < 0.35)
+        self.assertEqual(sorted(self.scans), ['found', 'not_found'])
+        self.assertEqual(ide_detection.get_launcher('fake_gdb')([], None), self.tool_path)
+
+    def testPersistedResults(self):
+        self.assertEqual(ide_detection.available(), ['fake_gdb'])
+        self.assertEqual(len(self.scans), 2)
+
+        # a new invocation uses the saved results without scanning:
+        self.reset()
+        self.assertEqual(ide_detection.available(), ['fake_gdb'])
+        self.assertEqual(len(self.scans), 2)
+
+    def testInvalidatedByToolchainChange(self):
+        ide_detection.available()
+        os.utime(self.tool_path, (1000, 1000))
+        self.reset()
+        self.assertEqual(ide_detection.available(), ['fake_gdb'])
+        self.assertEqual(len(self.scans), 4)
+
+        os.environ['PATH'] = self.bindir + os.pathsep + self.workingdir
+        self.reset()
+        ide_detection.available()
+        self.assertEqual(len(self.scans), 6)
+
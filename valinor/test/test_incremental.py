@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+import tempfile
+import shutil
+
+# internal modules:
+from . import cli
+
+class TestIncrementalGeneration(unittest.TestCase):
+    def setUp(self):
+        self.workingdir = tempfile.mkdtemp()
+        exedir = os.path.join(self.workingdir, 'build')
+        os.makedirs(exedir)
+        self.exe_path = os.path.join(exedir, 'myexe')
+        self.project_path = self.exe_path + '.uvproj'
+        with open(self.exe_path, 'w') as f:
+            f.write('ELF')
+
+    def tearDown(self):
+        shutil.rmtree(self.workingdir)
+
+    def runCheck(self, target, *extra_args):
+        args = [
+            '--tool', 'uvision',
+            '--target', target,
+            os.path.relpath(self.exe_path, self.workingdir),
+            '-n'
+        ] + list(extra_args)
+        out, err, status = cli.run(args, cwd = self.workingdir)
+        print(out)
+        print(err)
+        self.assertEqual(status, 0)
+        return err or out
+
+    def testSkipsUnchanged(self):
+        self.runCheck('K64F')
+        self.assertTrue(os.path.isfile(self.project_path))
+        self.assertTrue(os.path.isfile(os.path.join(self.workingdir, 'build', '.myexe.uvision.valinor')))
+        os.utime(self.project_path, (1000, 1000))
+
+        out = self.runCheck('K64F')
+        self.assertIn('up to date', out)
+        self.assertEqual(os.stat(self.project_path).st_mtime, 1000)
+
+        # forcing regeneration rewrites the same contents, which must not
+        # look like a modification:
+        self.runCheck('K64F', '--force')
+        self.assertEqual(os.stat(self.project_path).st_mtime, 1000)
+
+    def testRegeneratesChanged(self):
+        self.runCheck('K64F')
+        os.utime(self.project_path, (1000, 1000))
+        out = self.runCheck('frdm-k20d50m')
+        self.assertNotIn('up to date', out)
+        self.assertNotEqual(os.stat(self.project_path).st_mtime, 1000)
+
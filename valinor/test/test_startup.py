@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# Copyright 2015 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+import sys
+import subprocess
+import time
+
+# run valinor.main() with the given arguments, and report which of the
+# expensive dependencies were loaded
+_Startup_Script = """
+import sys
+sys.path.insert(0, sys.argv[1])
+sys.argv = ['valinor'] + sys.argv[2:]
+import valinor
+try:
+    valinor.main()
+except SystemExit:
+    pass
+heavy = ('project_generator', 'project_generator_definitions', 'elftools', 'pkg_resources', 'pyOCD')
+sys.stderr.write('loaded: %s\\n' % ','.join(m for m in heavy if m in sys.modules))
+"""
+
+class TestStartup(unittest.TestCase):
+    # the time allowed for "valinor --version" on top of starting an empty
+    # python interpreter. Loading project_generator takes several times this.
+    Overhead_Threshold = 0.25
+    Repeats = 3
+
+    def runValinor(self, args):
+        progdir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..')
+        child = subprocess.Popen(
+            [sys.executable, '-c', _Startup_Script, progdir] + args,
+            stdout = subprocess.PIPE,
+            stderr = subprocess.PIPE
+        )
+        out, err = child.communicate()
+        return out.decode('utf-8'), err.decode('utf-8')
+
+    def bestTime(self, cmd):
+        best = None
+        for i in range(self.Repeats):
+            start = time.time()
+            subprocess.check_call(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            t = time.time() - start
+            best = t if best is None else min(best, t)
+        return best
+
+    def testVersionIsLazy(self):
+        out, err = self.runValinor(['--version'])
+        self.assertTrue(out.strip())
+        self.assertIn('loaded: \n', err)
+
+    def testHelpIsLazy(self):
+        out, err = self.runValinor(['--help'])
+        self.assertIn('--target', out)
+        self.assertIn('loaded: \n', err)
+
+    def testStartupBenchmark(self):
+        progdir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..')
+        baseline = self.bestTime([sys.executable, '-c', 'pass'])
+        version = self.bestTime([sys.executable, '-c', _Startup_Script, progdir, '--version'])
+        overhead = version - baseline
+        print('valinor --version: %.3fs (%.3fs over empty interpreter)' % (version, overhead))
+        self.assertTrue(overhead < self.Overhead_Threshold,
+            'startup took %.3fs longer than an empty interpreter, threshold is %.3fs' % (
+                overhead, self.Overhead_Threshold
+            )
+        )
+